@@ -0,0 +1,166 @@
+import re
+import sys
+import numpy as np
+
+# Batched version of CodeAnalyzer.analyze_code_structure for many files at once.
+# All files are joined into one string, every per-line quantity becomes a flat
+# NumPy array, and per-file results come from segment reductions over those
+# arrays. Results are identical to the scalar path, including the order of
+# `indentation_levels`.
+
+# Line class codes produced by the tokenizer
+OTHER, CONTROL_FLOW, FUNCTION, CLASS, IMPORT, COMMENT = range(6)
+
+# The `stripped.startswith(...)` prefixes checked by CodeAnalyzer, per class
+_CONTROL_FLOW_KEYWORDS = ['if', 'elif', 'else', 'for', 'while', 'try', 'except', 'finally']
+_PREFIXES = (
+    [(keyword + suffix, CONTROL_FLOW) for keyword in _CONTROL_FLOW_KEYWORDS for suffix in (' ', ':')]
+    + [('def ', FUNCTION), ('async def ', FUNCTION), ('class ', CLASS),
+       ('import ', IMPORT), ('from ', IMPORT),
+       ('#', COMMENT), ('"""', COMMENT), ("'''", COMMENT)]
+)
+_PREFIX_WIDTH = max(len(prefix) for prefix, _ in _PREFIXES)
+
+_whitespace_table = None
+
+
+def _whitespace() -> np.ndarray:
+    """
+    Lookup table of code points for which str.isspace() is true (the set strip()
+    removes). Its last entry is False and stands in for every higher code point.
+    """
+    global _whitespace_table
+    if _whitespace_table is None:
+        # re's \s uses the same Unicode definition as str.isspace and scans in C
+        every_char = ''.join(map(chr, range(sys.maxunicode + 1)))
+        spaces = [m.start() for m in re.finditer(r'\s', every_char)]
+        table = np.zeros(max(spaces) + 2, dtype=bool)
+        table[spaces] = True
+        _whitespace_table = table
+    return _whitespace_table
+
+
+def _classify(codepoints: np.ndarray, first_solid: np.ndarray, last_solid: np.ndarray,
+              ends: np.ndarray, non_blank: np.ndarray) -> np.ndarray:
+    """
+    Class code per line from a vectorized prefix match at each line's first
+    non-whitespace character, i.e. on the stripped line.
+    """
+    classes = np.zeros(len(first_solid), dtype=np.int8)
+    lines = np.flatnonzero(non_blank)
+    if not len(lines):
+        return classes
+
+    # The first _PREFIX_WIDTH characters of every stripped line; 0 pads past the line end
+    index = first_solid[lines, None] + np.arange(_PREFIX_WIDTH)
+    inside = index < ends[lines, None]
+    window = np.where(inside, codepoints[np.minimum(index, len(codepoints) - 1)], 0)
+    stripped_length = last_solid[lines] - first_solid[lines] + 1
+
+    first_char = window[:, 0]
+    for prefix, code in _PREFIXES:
+        width = len(prefix)
+        # Narrow to lines starting with the right character before comparing the rest
+        candidates = np.flatnonzero(first_char == ord(prefix[0]))
+        # The padding never equals a prefix character, so a match always lies inside the line
+        match = (window[candidates, :width] == [ord(c) for c in prefix]).all(axis=1)
+        if prefix.endswith(' '):
+            # strip() drops trailing spaces, so something must follow the prefix
+            match &= stripped_length[candidates] > width
+        classes[lines[candidates[match]]] = code
+    return classes
+
+
+def _line_arrays(text: str) -> dict:
+    """Per-line length, indent, blank flag and class code for the joined text"""
+    codepoints = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    size = len(codepoints)
+
+    newlines = np.flatnonzero(codepoints == 10)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [size]))
+
+    # ASCII whitespace by range checks (unsigned wraparound rejects smaller values),
+    # everything above ASCII through the lookup table
+    whitespace = ((codepoints - 9) <= 4) | ((codepoints - 28) <= 4)
+    high = np.flatnonzero(codepoints > 127)
+    if len(high):
+        table = _whitespace()
+        whitespace[high] = table[np.minimum(codepoints[high], len(table) - 1)]
+
+    # First and last non-whitespace character of each line
+    solid = np.flatnonzero(~whitespace)
+    padded = np.concatenate(([-1], solid, [size]))
+    first_solid = padded[np.searchsorted(solid, starts) + 1]
+    last_solid = padded[np.searchsorted(solid, ends)]
+    non_blank = first_solid < ends
+
+    return {
+        'lengths': ends - starts,
+        'indents': first_solid - starts,
+        'non_blank': non_blank,
+        'classes': _classify(codepoints, first_solid, last_solid, ends, non_blank),
+    }
+
+
+def _indentation_levels(indents: np.ndarray, non_blank: np.ndarray, file_ids: np.ndarray, file_count: int) -> list:
+    """Per-file list(set(indents)), built from values in first-occurrence order as the scalar loop does"""
+    indents, file_ids = indents[non_blank], file_ids[non_blank]
+    if not len(indents):
+        return [[] for _ in range(file_count)]
+
+    keys = file_ids.astype(np.int64) * (int(indents.max()) + 1) + indents
+    _, first_index = np.unique(keys, return_index=True)
+    first_index.sort()
+
+    values = indents[first_index]
+    counts = np.bincount(file_ids[first_index], minlength=file_count)
+    groups = np.split(values, np.cumsum(counts)[:-1])
+    # Same insertion order gives the same set layout, hence the same list order
+    return [list(set(group.tolist())) for group in groups]
+
+
+def analyze_code_structure_batch(codes: list) -> list:
+    """Analyze many code snippets at once; element i equals CodeAnalyzer().analyze_code_structure(codes[i])"""
+    if not codes:
+        return []
+
+    file_count = len(codes)
+    line_counts = np.array([code.count('\n') + 1 for code in codes], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(line_counts)[:-1]))
+    file_ids = np.repeat(np.arange(file_count), line_counts)
+
+    lines = _line_arrays('\n'.join(codes))
+    classes = lines['classes']
+
+    def per_file_sum(values):
+        return np.add.reduceat(values.astype(np.int64), offsets).tolist()
+
+    total_length = per_file_sum(lines['lengths'])
+    max_length = np.maximum.reduceat(lines['lengths'], offsets).tolist()
+    non_empty = per_file_sum(lines['non_blank'])
+    control_flow = per_file_sum(classes == CONTROL_FLOW)
+    functions = per_file_sum(classes == FUNCTION)
+    class_counts = per_file_sum(classes == CLASS)
+    imports = per_file_sum(classes == IMPORT)
+    comments = per_file_sum(classes == COMMENT)
+    indentation = _indentation_levels(lines['indents'], lines['non_blank'], file_ids, file_count)
+    totals = line_counts.tolist()
+
+    return [
+        {
+            'total_lines': totals[i],
+            'non_empty_lines': non_empty[i],
+            'indentation_levels': indentation[i],
+            'function_count': functions[i],
+            'class_count': class_counts[i],
+            'import_count': imports[i],
+            'comment_count': comments[i],
+            'complexity_metrics': {
+                'control_flow_statements': control_flow[i],
+                'average_line_length': total_length[i] / totals[i],
+                'max_line_length': max_length[i]
+            }
+        }
+        for i in range(file_count)
+    ]
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from backend.state import StateBackend
+
+
+CACHE_TTL = int(os.getenv("CACHE_TTL", 3600))
+# Upstream LLM calls allowed per window across all workers; 0 disables the limit
+LLM_RATE_LIMIT = int(os.getenv("LLM_RATE_LIMIT", 0))
+LLM_RATE_WINDOW = int(os.getenv("LLM_RATE_WINDOW", 60))
+
+
+def cache_key(namespace: str, *parts: str) -> str:
+    """Build a fixed-length key from a namespace and the inputs that determine the result"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = (part or "").encode()
+        # Length prefix keeps ('ab', 'c') and ('a', 'bc') apart
+        digest.update(len(data).to_bytes(8, 'big') + data)
+    return f"cache:{namespace}:{digest.hexdigest()}"
+
+
+class ResponseCache:
+    """
+    JSON response cache on top of a StateBackend.
+
+    Hit/miss counters are kept per process: counting every lookup in the shared
+    backend would turn each read into a write (and take SQLite's write lock).
+    """
+
+    def __init__(self, backend: StateBackend, ttl: int = None):
+        self.backend = backend
+        self.ttl = ttl or CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+        # get() is called from threadpool threads
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        raw = self.backend.get(key)
+        with self._lock:
+            if raw is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value):
+        self.backend.set(key, json.dumps(value, default=str), self.ttl)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0
+        }
+
+
+class RateLimiter:
+    """Fixed-window counter shared through a StateBackend, so quota holds across workers"""
+
+    def __init__(self, backend: StateBackend, limit: int = None, window: int = None):
+        self.backend = backend
+        self.limit = limit if limit is not None else LLM_RATE_LIMIT
+        self.window = window or LLM_RATE_WINDOW
+
+    def allow(self, name: str, now: float = None, headroom: int = 0) -> bool:
+        """
+        Count one call against `name` and report whether it fits in the current window.
+        `headroom` keeps that many calls free for others; a refused call is not counted.
+        """
+        if not self.limit:
+            return True
+        key = self._key(name, now)
+        count = self.backend.incr(key, 1, self.window)
+        if count > self.limit - headroom:
+            self.backend.incr(key, -1, self.window)
+            return False
+        return True
+
+    def refund(self, name: str, now: float = None):
+        """Give back a call allowed earlier that was not made after all"""
+        if self.limit:
+            self.backend.incr(self._key(name, now), -1, self.window)
+
+    def _key(self, name: str, now: float = None) -> str:
+        window_start = int((now or time.time()) // self.window)
+        return f"rate:{name}:{window_start}"
@@ -1,20 +1,29 @@
-from deepdiff import DeepDiff
-from tree_sitter import Language, Parser
-import json
-import os
 import difflib
 
+# deepdiff and tree_sitter are imported on first use so that importing this
+# module (and starting the API) stays cheap for endpoints that never need them
+
 class CodeAnalyzer:
     def __init__(self):
-        self.parser = Parser()
+        self._parser = None
         # Note: You'll need to build tree-sitter grammars for specific languages
         # This is a basic setup - you can extend it for Python, JavaScript, etc.
+
+    @property
+    def parser(self):
+        """tree-sitter parser, created on first access"""
+        if self._parser is None:
+            from tree_sitter import Parser
+            self._parser = Parser()
+        return self._parser
         
     def compare_code(self, original_code: str, modified_code: str) -> dict:
         """
         Compare two code snippets using deepdiff with visual highlights
         """
         try:
+            from deepdiff import DeepDiff
+
             # Parse both code snippets
             original_lines = original_code.strip().split('\n')
             modified_lines = modified_code.strip().split('\n')
@@ -354,20 +363,40 @@ class CodeAnalyzer:
             'max_line_length': max(len(line) for line in lines) if lines else 0
         }
 
+_analyzer = None
+
+def get_analyzer() -> CodeAnalyzer:
+    """Shared CodeAnalyzer, built on first use"""
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = CodeAnalyzer()
+    return _analyzer
+
+def warm_up():
+    """Import deepdiff and build the tree-sitter parser ahead of the first request"""
+    import deepdiff  # noqa: F401
+    get_analyzer().parser
+
 # Example usage functions
 def compare_code_snippets(original: str, modified: str) -> dict:
     """Compare two code snippets and return detailed analysis"""
-    analyzer = CodeAnalyzer()
+    analyzer = get_analyzer()
     return analyzer.compare_code(original, modified)
 
 def analyze_code_quality(code: str) -> dict:
     """Analyze code quality and structure"""
-    analyzer = CodeAnalyzer()
+    analyzer = get_analyzer()
     return analyzer.analyze_code_structure(code)
 
+def analyze_code_quality_batch(codes: list) -> list:
+    """Analyze many snippets at once with vectorized metrics; same results as analyze_code_quality per snippet"""
+    # numpy is only needed for batches, so it is imported on first use
+    from backend.batch_metrics import analyze_code_structure_batch
+    return analyze_code_structure_batch(codes)
+
 def get_code_improvement_suggestions(original: str, modified: str) -> dict:
     """Get suggestions for code improvements based on comparison"""
-    analyzer = CodeAnalyzer()
+    analyzer = get_analyzer()
     
     comparison = analyzer.compare_code(original, modified)
     analysis = analyzer.analyze_code_structure(modified)
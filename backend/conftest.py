@@ -0,0 +1,38 @@
+"""
+Shared fixtures for the backend tests
+"""
+
+import asyncio
+from types import SimpleNamespace
+import pytest
+import backend.main as main
+from backend.prefetch import Prefetcher
+from backend.state import MemoryBackend
+from backend.cache import ResponseCache
+
+
+@pytest.fixture
+def fake_upstream(monkeypatch):
+    """
+    Replace the OpenRouter call and isolate the cache. `prompts` records every
+    prompt sent upstream and `events` each call's ("start" | "end", prompt);
+    tests may queue canned answers in `responses`.
+    """
+    prompts = []
+    responses = []
+    events = []
+
+    async def call_upstream(prompt, key, max_tokens=main.MAX_TOKENS):
+        prompts.append(prompt)
+        events.append(("start", prompt))
+        await asyncio.sleep(0.01)
+        result = responses.pop(0) if responses else f"answer {len(prompts)}"
+        main.response_cache.set(key, result)
+        events.append(("end", prompt))
+        return result
+
+    monkeypatch.setattr(main, "OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(main, "_call_upstream", call_upstream)
+    monkeypatch.setattr(main, "response_cache", ResponseCache(MemoryBackend()))
+    monkeypatch.setattr(main, "prefetcher", Prefetcher(enabled=True, concurrency=1))
+    return SimpleNamespace(prompts=prompts, responses=responses, events=events)
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+
+# Tunables for the background job system
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", 3600))
+JOB_SWEEP_INTERVAL = int(os.getenv("JOB_SWEEP_INTERVAL", 60))
+# When set, jobs are written to this directory and survive a restart
+JOBS_DIR = os.getenv("JOBS_DIR")
+# Each manager refreshes a heartbeat file this often while it runs; a job owner
+# whose heartbeat is older than JOB_OWNER_TIMEOUT is considered dead
+JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", 10))
+JOB_OWNER_TIMEOUT = int(os.getenv("JOB_OWNER_TIMEOUT", 30))
+# Seconds between disk reads when waiting on a job run by another process
+JOB_POLL_INTERVAL = 1
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED_STATES = (COMPLETED, FAILED)
+
+
+class JobManager:
+    """
+    In-process job queue with a fixed pool of asyncio workers.
+
+    Handlers are registered per job kind and receive the job payload dict.
+    Finished jobs are kept for `result_ttl` seconds and then swept away.
+    With `jobs_dir` set, every state change is written to disk. Each job records
+    its owner (pid plus a heartbeat file), and pending jobs whose owner stopped
+    heartbeating are claimed and re-run by exactly one manager sharing the directory.
+    """
+
+    def __init__(self, workers: int = None, result_ttl: int = None,
+                 sweep_interval: int = None, jobs_dir: str = None):
+        self.workers = workers or JOB_WORKERS
+        self.result_ttl = result_ttl if result_ttl is not None else JOB_RESULT_TTL
+        self.sweep_interval = sweep_interval or JOB_SWEEP_INTERVAL
+        self.jobs_dir = jobs_dir if jobs_dir is not None else JOBS_DIR
+        self.handlers = {}
+        self.jobs = {}
+        self._changed = {}
+        # Jobs submitted before start() wait here until the workers run
+        self._queue = asyncio.Queue()
+        self._tasks = []
+        self.owner = {'pid': os.getpid(), 'instance': uuid.uuid4().hex}
+
+    def register(self, kind: str, handler):
+        """Register an async handler `handler(payload) -> dict` for a job kind"""
+        self.handlers[kind] = handler
+
+    async def start(self):
+        """Restore persisted jobs and start the worker and sweeper tasks"""
+        # A queue is bound to the loop that first waits on it, so each start gets
+        # a fresh one carrying over jobs submitted while stopped
+        queue = asyncio.Queue()
+        while not self._queue.empty():
+            queue.put_nowait(self._queue.get_nowait())
+        self._queue = queue
+        if self.jobs_dir:
+            os.makedirs(self._heartbeat_dir(), exist_ok=True)
+            self._heartbeat()
+            self._restore(load_finished=True)
+            self._tasks.append(asyncio.create_task(self._heartbeat_loop()))
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+
+    async def stop(self):
+        """Cancel the background tasks; persisted pending jobs are adopted by another manager"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.jobs_dir:
+            # Without a heartbeat our pending jobs are free to be claimed at once
+            try:
+                os.remove(self._heartbeat_path(self.owner['instance']))
+            except FileNotFoundError:
+                pass
+
+    def submit(self, kind: str, payload: dict) -> dict:
+        """Queue a new job and return its record"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'status': QUEUED,
+            'payload': payload,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'finished_at': None,
+            'owner': dict(self.owner)
+        }
+        self.jobs[job['id']] = job
+        self._save(job)
+        self._queue.put_nowait(job['id'])
+        return job
+
+    def get(self, job_id: str) -> dict:
+        job = self.jobs.get(job_id)
+        if job is None and self.jobs_dir:
+            # The job may belong to another worker process sharing jobs_dir
+            job = self._read(self._path(job_id))
+            if job and job['status'] in FINISHED_STATES and time.time() - job['finished_at'] > self.result_ttl:
+                return None
+        return job
+
+    async def wait_for_change(self, job_id: str, since: float, timeout: float) -> dict:
+        """
+        Wait until the job's `updated_at` differs from `since` or the timeout elapses,
+        then return the current record (None once it is gone).
+
+        The event is registered before the record is checked, so a change that
+        lands between the caller's last read and this call is never missed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            event = self._changed.setdefault(job_id, asyncio.Event()) if job_id in self.jobs else None
+            job = self.get(job_id)
+            remaining = deadline - loop.time()
+            if job is None or job['updated_at'] != since or remaining <= 0:
+                return job
+            if event is None:
+                # Run by another process, which cannot signal us: poll its record
+                await asyncio.sleep(min(remaining, JOB_POLL_INTERVAL))
+                continue
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _update(self, job: dict, **fields):
+        job.update(fields)
+        job['updated_at'] = time.time()
+        if job['status'] in FINISHED_STATES:
+            job['finished_at'] = job['updated_at']
+        self._save(job)
+        event = self._changed.pop(job['id'], None)
+        if event:
+            event.set()
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if job is None or job['status'] != QUEUED:
+                continue
+
+            self._update(job, status=RUNNING)
+            try:
+                result = await self.handlers[job['kind']](job['payload'])
+                self._update(job, status=COMPLETED, result=result)
+            except asyncio.CancelledError:
+                # Shutting down: leave the job queued so it is picked up again
+                self._update(job, status=QUEUED)
+                raise
+            except Exception as e:
+                detail = getattr(e, 'detail', None) or str(e)
+                self._update(job, status=FAILED, error=detail)
+
+    async def _sweeper(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+            if self.jobs_dir:
+                # Adopt jobs left behind by a worker that died after we started
+                self._restore()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
+            self._heartbeat()
+
+    def _heartbeat_dir(self) -> str:
+        return os.path.join(self.jobs_dir, 'workers')
+
+    def _heartbeat_path(self, instance: str) -> str:
+        return os.path.join(self._heartbeat_dir(), instance)
+
+    def _heartbeat(self):
+        with open(self._heartbeat_path(self.owner['instance']), 'w') as f:
+            f.write(str(self.owner['pid']))
+
+    def _owner_alive(self, job: dict) -> bool:
+        """Whether the manager recorded as the job's owner is still running"""
+        owner = job.get('owner')
+        if not owner:
+            return False
+        if owner['instance'] == self.owner['instance']:
+            return True
+        try:
+            age = time.time() - os.path.getmtime(self._heartbeat_path(owner['instance']))
+        except FileNotFoundError:
+            return False
+        if age > JOB_OWNER_TIMEOUT:
+            return False
+        try:
+            os.kill(owner['pid'], 0)
+        except ProcessLookupError:
+            # Died since its last heartbeat
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def sweep(self, now: float = None):
+        """Drop finished jobs whose results are older than the TTL"""
+        now = now or time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['status'] in FINISHED_STATES and now - job['finished_at'] > self.result_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+            self._changed.pop(job_id, None)
+            if self.jobs_dir:
+                try:
+                    os.remove(self._path(job_id))
+                except FileNotFoundError:
+                    pass
+        return len(expired)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job: dict):
+        if not self.jobs_dir:
+            return
+        # Write then rename so a crash never leaves a half-written record
+        path = self._path(job['id'])
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str) -> dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _claim(self, job_id: str) -> dict:
+        """
+        Take over a pending job whose owner is dead; returns the claimed record or None.
+
+        Renaming the record is atomic, so only one manager holds a given version of
+        it. The renamed file is then re-read: if another manager claimed the job in
+        the meantime, its live ownership shows up there and the claim is abandoned.
+        """
+        path = self._path(job_id)
+        claim_path = f"{path}.{self.owner['instance']}.claim"
+        try:
+            os.rename(path, claim_path)
+        except FileNotFoundError:
+            return None
+
+        job = self._read(claim_path)
+        if job is None or job['status'] in FINISHED_STATES or self._owner_alive(job):
+            # Not ours to take: put it back unless its owner already rewrote it
+            try:
+                os.link(claim_path, path)
+            except FileExistsError:
+                pass
+            os.remove(claim_path)
+            return None
+
+        job['status'] = QUEUED
+        job['owner'] = dict(self.owner)
+        self._save(job)
+        os.remove(claim_path)
+        return job
+
+    def _restore(self, load_finished: bool = False):
+        """Claim pending jobs of dead owners, oldest first; optionally load finished ones for lookups"""
+        pending = []
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith('.json'):
+                continue
+            job = self._read(os.path.join(self.jobs_dir, name))
+            if job is None or job['id'] in self.jobs:
+                continue
+            if job['status'] in FINISHED_STATES:
+                if load_finished:
+                    self.jobs[job['id']] = job
+            elif not self._owner_alive(job):
+                pending.append(job)
+
+        # Interrupted while queued or running: run again in submission order
+        for candidate in sorted(pending, key=lambda j: j['created_at']):
+            job = self._claim(candidate['id'])
+            if job is not None:
+                self.jobs[job['id']] = job
+                self._queue.put_nowait(job['id'])
@@ -0,0 +1,183 @@
+import os
+from pydantic_core import PydanticCustomError
+from starlette.responses import JSONResponse
+
+
+# Hard caps on incoming code; all of them can be tuned through the environment
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", 1_000_000))
+MAX_CODE_LINES = int(os.getenv("MAX_CODE_LINES", 5_000))
+MAX_LINE_LENGTH = int(os.getenv("MAX_LINE_LENGTH", 1_000))
+
+# Larger caps for the batch job path, which does not hold a connection open
+JOB_MAX_REQUEST_BYTES = int(os.getenv("JOB_MAX_REQUEST_BYTES", 10_000_000))
+JOB_MAX_CODE_LINES = int(os.getenv("JOB_MAX_CODE_LINES", 50_000))
+
+# A request body carries at most this many free-text fields (code, error, ...)
+MAX_TEXT_FIELDS = 3
+# One decoded character is at most six bytes of JSON (a \uXXXX escape)
+MAX_ESCAPE_WIDTH = 6
+# Room for the JSON keys and punctuation between two text fields
+FIELD_OVERHEAD_BYTES = 256
+
+LIMITED_METHODS = ("POST", "PUT", "PATCH")
+
+
+def check_code_limits(code: str, max_lines: int = None, max_line_length: int = None) -> str:
+    """
+    Validate a code string against the configured line limits.
+    Raises a PydanticCustomError of type 'input_too_large' so the API can answer with 413.
+    """
+    max_lines = max_lines or MAX_CODE_LINES
+    max_line_length = max_line_length or MAX_LINE_LENGTH
+
+    lines = code.split('\n')
+    if len(lines) > max_lines:
+        raise PydanticCustomError(
+            'input_too_large',
+            'Code has {lines} lines, the limit is {limit}',
+            {'lines': len(lines), 'limit': max_lines}
+        )
+
+    longest = max(len(line) for line in lines)
+    if longest > max_line_length:
+        raise PydanticCustomError(
+            'input_too_large',
+            'Code has a line of {length} characters, the limit is {limit}',
+            {'length': longest, 'limit': max_line_length}
+        )
+
+    return code
+
+
+def too_large_response(detail: str) -> JSONResponse:
+    """Build the 413 response shared by the middleware and the validation handler"""
+    return JSONResponse(status_code=413, content={"detail": detail})
+
+
+class BodyScanner:
+    """
+    Incrementally track size and line shape of a raw JSON body.
+
+    Newlines inside JSON strings arrive as the two-byte escape '\\n', so the scanner
+    counts those escapes (skipping escaped backslashes) across chunk boundaries.
+    Line checks here are upper bounds; exact checks run after parsing.
+    """
+
+    def __init__(self, max_bytes: int, max_lines: int, max_line_length: int):
+        self.max_bytes = max_bytes
+        self.max_newlines = max_lines * MAX_TEXT_FIELDS
+        self.max_raw_run = max_line_length * MAX_ESCAPE_WIDTH * MAX_TEXT_FIELDS + FIELD_OVERHEAD_BYTES
+        self.total_bytes = 0
+        self.newlines = 0
+        self.current_run = 0
+        self._carry = b''
+
+    def feed(self, chunk: bytes) -> str:
+        """Consume a chunk and return an error message once a limit is exceeded"""
+        self.total_bytes += len(chunk)
+        if self.total_bytes > self.max_bytes:
+            return f"Request body exceeds {self.max_bytes} bytes"
+
+        data = self._carry + chunk
+        # Keep a trailing unpaired backslash for the next chunk
+        trailing = len(data) - len(data.rstrip(b'\\'))
+        if trailing % 2:
+            data, self._carry = data[:-1], b'\\'
+        else:
+            self._carry = b''
+
+        # Blank out escaped backslashes so '\\\\n' is not mistaken for a newline
+        segments = data.replace(b'\\\\', b'__').split(b'\\n')
+        for segment in segments[:-1]:
+            if self.current_run + len(segment) > self.max_raw_run:
+                return "Request contains a line that exceeds the line length limit"
+            self.current_run = 0
+        self.current_run += len(segments[-1])
+        self.newlines += len(segments) - 1
+
+        if self.current_run > self.max_raw_run:
+            return "Request contains a line that exceeds the line length limit"
+        if self.newlines > self.max_newlines:
+            return "Request exceeds the line count limit"
+        return None
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware that rejects oversized bodies with 413 while they stream in,
+    before FastAPI parses JSON or runs any handler.
+
+    `path_limits` maps path prefixes to overrides ({'max_bytes': ..., 'max_lines': ...})
+    so selected routes, such as the batch job path, can accept larger inputs than the
+    interactive endpoints. `hint` is appended to 413 messages on all other routes.
+    """
+
+    def __init__(self, app, max_bytes: int = None, max_lines: int = None,
+                 max_line_length: int = None, path_limits: dict = None, hint: str = None):
+        self.app = app
+        self.max_bytes = max_bytes or MAX_REQUEST_BYTES
+        self.max_lines = max_lines or MAX_CODE_LINES
+        self.max_line_length = max_line_length or MAX_LINE_LENGTH
+        self.path_limits = path_limits or {}
+        self.hint = hint
+
+    def _limits_for(self, path: str) -> tuple:
+        """Return (max_bytes, max_lines, hint) for a request path"""
+        for prefix, overrides in self.path_limits.items():
+            if path.startswith(prefix):
+                return (overrides.get('max_bytes', self.max_bytes),
+                        overrides.get('max_lines', self.max_lines),
+                        None)
+        return self.max_bytes, self.max_lines, self.hint
+
+    @staticmethod
+    def _reject(detail: str, hint: str) -> JSONResponse:
+        return too_large_response(f"{detail}. {hint}" if hint else detail)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in LIMITED_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes, max_lines, hint = self._limits_for(scope["path"])
+
+        # Fast path: trust an explicit Content-Length when it is already too big
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > max_bytes:
+                    response = self._reject(f"Request body exceeds {max_bytes} bytes", hint)
+                    await response(scope, receive, send)
+                    return
+                break
+
+        scanner = BodyScanner(max_bytes, max_lines, self.max_line_length)
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            error = scanner.feed(chunk)
+            if error:
+                response = self._reject(error, hint)
+                await response(scope, receive, send)
+                return
+            chunks.append(chunk)
+            more_body = message.get("more_body", False)
+
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay, send)
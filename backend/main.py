@@ -1,22 +1,117 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from backend.models import CodeRequest, ResponseModel
-from backend.prompts import walkthrough_prompt, debug_prompt, refactor_prompt
-from openai import OpenAI
-from backend.code_analysis import CodeAnalyzer, compare_code_snippets, analyze_code_quality, get_code_improvement_suggestions
-import os
+from backend import startup
 from dotenv import load_dotenv
 
-
+# Load .env before any backend module reads its settings from the environment
 load_dotenv()
 
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from backend.models import CodeRequest, CompareRequest, JobRequest, ResponseModel, ReviewResponse
+from backend.limits import RequestSizeLimitMiddleware, too_large_response, JOB_MAX_REQUEST_BYTES, JOB_MAX_CODE_LINES
+from backend.jobs import JobManager, COMPLETED, FAILED, FINISHED_STATES
+from backend.state import create_backend, STATE_PURGE_INTERVAL
+from backend.cache import ResponseCache, RateLimiter, cache_key, LLM_RATE_WINDOW
+from backend.prefetch import Prefetcher, PrefetchSkipped, PREFETCH_BUDGET, PREFETCH_RESERVE
+from backend.prompts import walkthrough_prompt, debug_prompt, refactor_prompt, review_prompt, parse_review_response
+from backend.code_analysis import compare_code_snippets, analyze_code_quality, get_code_improvement_suggestions
+from backend.code_analysis import warm_up as warm_up_analysis
+import os
+import json
+import asyncio
+import threading
+
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 MODEL_NAME = "deepseek/deepseek-chat-v3-0324:free"
+MAX_TOKENS = 2000
+# A combined review carries three answers in one completion
+REVIEW_MAX_TOKENS = 6000
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+# Cache and upstream quota live in STATE_BACKEND so they are shared across workers
+state_backend = create_backend()
+response_cache = ResponseCache(state_backend)
+llm_rate_limiter = RateLimiter(state_backend)
+prefetch_limiter = RateLimiter(state_backend, limit=PREFETCH_BUDGET, window=LLM_RATE_WINDOW)
+
+# Speculative LLM calls for the modes a user is likely to open next
+prefetcher = Prefetcher()
+
+# Upstream calls currently running, keyed by cache key, so duplicates can join them
+_in_flight = {}
 
-code_analyzer = CodeAnalyzer()
+job_manager = JobManager()
 
-app = FastAPI(title="AI Code Mentor", description="AI-powered code assistance using DeepSeek V3 with deepdiff and tree-sitter analysis")
+# Seconds between SSE status events while a job is still running
+JOB_EVENT_INTERVAL = 15
+
+BATCH_HINT = "Submit large inputs through POST /jobs instead"
+
+def get_llm_client():
+    """
+    OpenRouter client, created on first use and reused so its HTTP connection pool
+    stays warm. Blocking (it imports openai), so call it from the threadpool.
+    """
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            # openai is the slowest import in the app; only LLM endpoints pay for it
+            from openai import OpenAI
+            _llm_client = OpenAI(
+                base_url="https://openrouter.ai/api/v1",
+                api_key=OPENROUTER_API_KEY,
+                default_headers={
+                    "HTTP-Referer": "http://localhost:3000", 
+                    "X-Title": "AI Code Mentor"  
+                }
+            )
+    return _llm_client
+
+def warm_up_llm_client():
+    """Create the client and open a pooled connection to OpenRouter with a cheap request"""
+    # Short timeout and no retries: a slow OpenRouter must not hold up readiness
+    get_llm_client().with_options(timeout=5, max_retries=0).models.list()
+
+async def purge_state():
+    """Periodically drop expired cache entries and rate windows that are never read again"""
+    while True:
+        await asyncio.sleep(STATE_PURGE_INTERVAL)
+        try:
+            await run_in_threadpool(state_backend.purge_expired)
+        except Exception:
+            # A busy shared backend only delays the purge to the next round
+            pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if startup.WARMUP_ON_STARTUP:
+        steps = {"analysis": warm_up_analysis}
+        if OPENROUTER_API_KEY:
+            steps["llm_client"] = warm_up_llm_client
+        await run_in_threadpool(startup.warm_up, steps)
+    await job_manager.start()
+    purger = asyncio.create_task(purge_state())
+    yield
+    purger.cancel()
+    await asyncio.gather(purger, return_exceptions=True)
+    await prefetcher.stop()
+    await job_manager.stop()
+
+app = FastAPI(title="AI Code Mentor", description="AI-powered code assistance using DeepSeek V3 with deepdiff and tree-sitter analysis", lifespan=lifespan)
+
+# Added before CORS so CORS wraps the size limiter and 413 responses carry CORS headers
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    path_limits={"/jobs": {"max_bytes": JOB_MAX_REQUEST_BYTES, "max_lines": JOB_MAX_CODE_LINES}},
+    hint=BATCH_HINT,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,50 +121,156 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-async def ask_deepseek(prompt: str) -> str:
-    """Send prompt to DeepSeek V3 via OpenRouter API and return response"""
+app.add_middleware(startup.FirstResponseTimer)
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Answer 413 instead of 422 when a field failed only because it is too large"""
+    for error in exc.errors():
+        if error.get("type") == "input_too_large":
+            detail = error.get("msg", "Input too large")
+            if not request.url.path.startswith("/jobs"):
+                detail = f"{detail}. {BATCH_HINT}"
+            return too_large_response(detail)
+    return await request_validation_exception_handler(request, exc)
+
+def _create_completion(prompt: str, max_tokens: int):
+    return get_llm_client().chat.completions.create(
+        model=MODEL_NAME,
+        messages=[
+            {"role": "system", "content": "You are an expert programming mentor. Provide clear, helpful explanations and code improvements."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        temperature=0.3,
+        top_p=0.9,
+    )
+
+async def _call_upstream(prompt: str, key: str, max_tokens: int = MAX_TOKENS) -> str:
+    try:
+        # Client creation (the openai import) and the request both block; keep them off the event loop
+        response = await run_in_threadpool(_create_completion, prompt, max_tokens)
+        
+        result = response.choices[0].message.content.strip()
+            
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"OpenRouter API error: {str(e)}")
+
+    await run_in_threadpool(response_cache.set, key, result)
+    return result
+
+async def ask_deepseek(prompt: str, background: bool = False, max_tokens: int = MAX_TOKENS) -> str:
+    """
+    Send prompt to DeepSeek V3 via OpenRouter API and return response.
+    Identical prompts already in flight are joined rather than sent twice.
+    Background (prefetch) calls only spend the prefetch budget and never the
+    quota reserved for interactive requests.
+    """
+    if background:
+        return await _ask_deepseek(prompt, background, max_tokens)
+    # Mark the call interactive before its first await: prefetch scheduled alongside
+    # it must not reach the upstream API while the cache and quota are checked
+    async with prefetcher.interactive():
+        return await _ask_deepseek(prompt, background, max_tokens)
+
+async def _ask_deepseek(prompt: str, background: bool, max_tokens: int) -> str:
     if not OPENROUTER_API_KEY or OPENROUTER_API_KEY == "your_openrouter_api_key_here":
         raise HTTPException(
             status_code=500, 
             detail="Please set your OpenRouter API key in the .env file"
         )
     
-    try:
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=OPENROUTER_API_KEY,
-            default_headers={
-                "HTTP-Referer": "http://localhost:3000", 
-                "X-Title": "AI Code Mentor"  
-            }
-        )
-        
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": "You are an expert programming mentor. Provide clear, helpful explanations and code improvements."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=2000,
-            temperature=0.3,
-            top_p=0.9,
-        )
-        
-        return response.choices[0].message.content.strip()
-            
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"OpenRouter API error: {str(e)}")
+    key = cache_key("llm", MODEL_NAME, str(max_tokens), prompt)
+    # State backend calls may hit SQLite or Redis; keep them off the event loop
+    cached = await run_in_threadpool(response_cache.get, key)
+    if cached is not None:
+        return cached
+
+    pending = _in_flight.get(key)
+    if pending is None:
+        if background:
+            # Global headroom first, so a refused prefetch never spends prefetch budget
+            if not await run_in_threadpool(llm_rate_limiter.allow, "llm", headroom=PREFETCH_RESERVE):
+                raise PrefetchSkipped("No spare upstream quota for prefetch")
+            if not await run_in_threadpool(prefetch_limiter.allow, "prefetch"):
+                await run_in_threadpool(llm_rate_limiter.refund, "llm")
+                raise PrefetchSkipped("Prefetch budget spent for this window")
+        elif not await run_in_threadpool(llm_rate_limiter.allow, "llm"):
+            raise HTTPException(status_code=429, detail="Upstream LLM quota exceeded, please try again later")
+
+        # Another request may have started the same call while we checked the quota
+        pending = _in_flight.get(key)
+        if pending is not None:
+            await run_in_threadpool(llm_rate_limiter.refund, "llm")
+            if background:
+                await run_in_threadpool(prefetch_limiter.refund, "prefetch")
+
+    if pending is None:
+        pending = asyncio.ensure_future(_call_upstream(prompt, key, max_tokens))
+        _in_flight[key] = pending
+
+        def forget(task):
+            _in_flight.pop(key, None)
+            # Mark the error as retrieved even if every waiter has gone away
+            if not task.cancelled():
+                task.exception()
+
+        pending.add_done_callback(forget)
+
+    # Shield so a disconnecting client does not abort a call others are waiting on
+    return await asyncio.shield(pending)
+
+LLM_PROMPTS = {
+    "walkthrough": walkthrough_prompt,
+    "debug": debug_prompt,
+    "refactor": refactor_prompt,
+}
+
+def schedule_prefetch(req: CodeRequest, requested_mode: str):
+    """Compute the other LLM modes for this snippet in the background when the client opted in"""
+    if not req.prefetch:
+        return
+
+    work = {}
+    for mode, build_prompt in LLM_PROMPTS.items():
+        if mode != requested_mode:
+            prompt = build_prompt(req.code)
+            work[mode] = lambda prompt=prompt: ask_deepseek(prompt, background=True)
+    prefetcher.schedule(cache_key("snippet", req.code), work)
+
+async def cached_analysis(namespace: str, func, *args) -> dict:
+    """Run a code_analysis function in the threadpool, reusing cached results for identical input"""
+    key = cache_key(namespace, *args)
+    cached = await run_in_threadpool(response_cache.get, key)
+    if cached is not None:
+        return cached
+
+    result = await run_in_threadpool(func, *args)
+    if 'error' not in result:
+        await run_in_threadpool(response_cache.set, key, result)
+    return result
 
 @app.get("/")
 async def root():
     return {"message": "AI Code Mentor API is running!"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe; the app only starts serving once the optional warm-up has finished"""
+    return {"ready": True, "warmed_up": startup.timings["warmup_seconds"] is not None}
+
+@app.get("/stats")
+async def stats():
+    """Report response cache hit ratio, prefetch counters and startup timings for this worker"""
+    return {"cache": response_cache.stats(), "prefetch": prefetcher.stats, "startup": startup.timings}
+
 @app.post("/walkthrough", response_model=ResponseModel)
 async def walkthrough(req: CodeRequest):
     """Explain code line by line"""
     if not req.code.strip():
         raise HTTPException(status_code=400, detail="Code cannot be empty")
     
+    schedule_prefetch(req, "walkthrough")
     prompt = walkthrough_prompt(req.code)
     result = await ask_deepseek(prompt)
     return ResponseModel(result=result)
@@ -80,6 +281,7 @@ async def debug(req: CodeRequest):
     if not req.code.strip():
         raise HTTPException(status_code=400, detail="Code cannot be empty")
     
+    schedule_prefetch(req, "debug")
     prompt = debug_prompt(req.code, req.error)
     result = await ask_deepseek(prompt)
     return ResponseModel(result=result)
@@ -90,10 +292,46 @@ async def refactor(req: CodeRequest):
     if not req.code.strip():
         raise HTTPException(status_code=400, detail="Code cannot be empty")
     
+    schedule_prefetch(req, "refactor")
     prompt = refactor_prompt(req.code)
     result = await ask_deepseek(prompt)
     return ResponseModel(result=result)
 
+async def run_review(code: str, error: str = None) -> dict:
+    """
+    Ask for walkthrough, bug review and refactor in one upstream call, sending the code once.
+    Falls back to the three separate prompts in parallel if the answer cannot be split.
+    """
+    text = await ask_deepseek(review_prompt(code, error), max_tokens=REVIEW_MAX_TOKENS)
+    sections = parse_review_response(text)
+    if sections is not None:
+        return {**sections, "combined": True}
+
+    walkthrough_result, debug_result, refactor_result = await asyncio.gather(
+        ask_deepseek(walkthrough_prompt(code)),
+        ask_deepseek(debug_prompt(code, error)),
+        ask_deepseek(refactor_prompt(code)),
+    )
+    return {
+        "walkthrough": walkthrough_result,
+        "debug": debug_result,
+        "refactor": refactor_result,
+        "combined": False
+    }
+
+@app.post("/review", response_model=ReviewResponse)
+async def review(req: CodeRequest):
+    """Walkthrough, bug review and refactor of the same code from a single upstream call"""
+    if not req.code.strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+
+    return ReviewResponse(**await run_review(req.code, req.error))
+
+@app.post("/prefetch/cancel")
+async def cancel_prefetch(req: CodeRequest):
+    """Cancel background prefetches for a snippet that have not reached the upstream API yet"""
+    return {"cancelled": prefetcher.cancel(cache_key("snippet", req.code))}
+
 @app.post("/analyze")
 async def analyze_code(req: CodeRequest):
     """Analyze code structure and quality using tree-sitter"""
@@ -101,7 +339,7 @@ async def analyze_code(req: CodeRequest):
         raise HTTPException(status_code=400, detail="Code cannot be empty")
     
     try:
-        analysis = analyze_code_quality(req.code)
+        analysis = await cached_analysis("analyze", analyze_code_quality, req.code)
         return {
             "analysis": analysis,
             "message": "Code analysis completed successfully"
@@ -110,16 +348,16 @@ async def analyze_code(req: CodeRequest):
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 @app.post("/compare")
-async def compare_code(req: dict):
+async def compare_code(req: CompareRequest):
     """Compare two code snippets using deepdiff"""
-    original_code = req.get("original_code", "")
-    modified_code = req.get("modified_code", "")
+    original_code = req.original_code
+    modified_code = req.modified_code
     
     if not original_code.strip() or not modified_code.strip():
         raise HTTPException(status_code=400, detail="Both original and modified code are required")
     
     try:
-        comparison = compare_code_snippets(original_code, modified_code)
+        comparison = await cached_analysis("compare", compare_code_snippets, original_code, modified_code)
         return {
             "comparison": comparison,
             "message": "Code comparison completed successfully"
@@ -128,16 +366,16 @@ async def compare_code(req: dict):
         raise HTTPException(status_code=500, detail=f"Comparison error: {str(e)}")
 
 @app.post("/improve")
-async def get_improvements(req: dict):
+async def get_improvements(req: CompareRequest):
     """Get code improvement suggestions based on analysis"""
-    original_code = req.get("original_code", "")
-    modified_code = req.get("modified_code", "")
+    original_code = req.original_code
+    modified_code = req.modified_code
     
     if not original_code.strip() or not modified_code.strip():
         raise HTTPException(status_code=400, detail="Both original and modified code are required")
     
     try:
-        improvements = get_code_improvement_suggestions(original_code, modified_code)
+        improvements = await cached_analysis("improve", get_code_improvement_suggestions, original_code, modified_code)
         return {
             "improvements": improvements,
             "message": "Improvement analysis completed successfully"
@@ -145,6 +383,104 @@ async def get_improvements(req: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Improvement analysis error: {str(e)}")
 
+async def _walkthrough_job(payload: dict) -> dict:
+    return {"result": await ask_deepseek(walkthrough_prompt(payload["code"]))}
+
+async def _debug_job(payload: dict) -> dict:
+    return {"result": await ask_deepseek(debug_prompt(payload["code"], payload.get("error")))}
+
+async def _refactor_job(payload: dict) -> dict:
+    return {"result": await ask_deepseek(refactor_prompt(payload["code"]))}
+
+async def _review_job(payload: dict) -> dict:
+    return await run_review(payload["code"], payload.get("error"))
+
+async def _analyze_job(payload: dict) -> dict:
+    analysis = await cached_analysis("analyze", analyze_code_quality, payload["code"])
+    return {"analysis": analysis}
+
+async def _compare_job(payload: dict) -> dict:
+    comparison = await cached_analysis("compare", compare_code_snippets, payload["original_code"], payload["modified_code"])
+    return {"comparison": comparison}
+
+async def _improve_job(payload: dict) -> dict:
+    improvements = await cached_analysis("improve", get_code_improvement_suggestions, payload["original_code"], payload["modified_code"])
+    return {"improvements": improvements}
+
+job_manager.register("walkthrough", _walkthrough_job)
+job_manager.register("debug", _debug_job)
+job_manager.register("refactor", _refactor_job)
+job_manager.register("review", _review_job)
+job_manager.register("analyze", _analyze_job)
+job_manager.register("compare", _compare_job)
+job_manager.register("improve", _improve_job)
+
+def _job_view(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "finished_at": job["finished_at"]
+    }
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs", status_code=202)
+async def submit_job(req: JobRequest):
+    """Queue a long-running analysis or LLM review and return its job id"""
+    if req.kind in ("compare", "improve"):
+        if not (req.original_code or "").strip() or not (req.modified_code or "").strip():
+            raise HTTPException(status_code=400, detail="Both original and modified code are required")
+    elif not (req.code or "").strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+
+    job = job_manager.submit(req.kind, req.model_dump(exclude={"kind"}, exclude_none=True))
+    return _job_view(job)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll the status of a job"""
+    return _job_view(_get_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Fetch the result of a finished job"""
+    job = _get_job_or_404(job_id)
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return job["result"]
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Stream job status changes as server-sent events until the job finishes"""
+    _get_job_or_404(job_id)
+
+    async def stream():
+        job = job_manager.get(job_id)
+        while True:
+            if job is None:
+                yield "event: expired\ndata: {}\n\n"
+                return
+            # Snapshot before yielding; the record may change while the client reads
+            view = _job_view(job)
+            yield f"event: status\ndata: {json.dumps(view)}\n\n"
+            if view["status"] in FINISHED_STATES:
+                return
+            job = await job_manager.wait_for_change(job_id, view["updated_at"], JOB_EVENT_INTERVAL)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+startup.mark("import_seconds")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
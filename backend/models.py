@@ -1,9 +1,45 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, field_validator
+from typing import Optional, Literal
+from backend.limits import check_code_limits, JOB_MAX_CODE_LINES
 
 class CodeRequest(BaseModel):
     code: str
     error: Optional[str] = None  
+    # Opt in to background computation of the other LLM modes for this code
+    prefetch: bool = False
+
+    @field_validator('code', 'error')
+    @classmethod
+    def within_limits(cls, value):
+        return check_code_limits(value) if value is not None else value
+
+class CompareRequest(BaseModel):
+    original_code: str = ""
+    modified_code: str = ""
+
+    @field_validator('original_code', 'modified_code')
+    @classmethod
+    def within_limits(cls, value):
+        return check_code_limits(value)
+
+class JobRequest(BaseModel):
+    kind: Literal['walkthrough', 'debug', 'refactor', 'review', 'analyze', 'compare', 'improve']
+    code: Optional[str] = None
+    error: Optional[str] = None
+    original_code: Optional[str] = None
+    modified_code: Optional[str] = None
+
+    @field_validator('code', 'error', 'original_code', 'modified_code')
+    @classmethod
+    def within_limits(cls, value):
+        return check_code_limits(value, max_lines=JOB_MAX_CODE_LINES) if value is not None else value
 
 class ResponseModel(BaseModel):
     result: str
+
+class ReviewResponse(BaseModel):
+    walkthrough: str
+    debug: str
+    refactor: str
+    # False when the combined answer could not be split and each mode was asked separately
+    combined: bool
@@ -0,0 +1,113 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+
+# Server-side switch; clients must also ask for prefetch per request
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+# Background upstream calls allowed at once, and per LLM rate window
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", 1))
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", 10))
+# Upstream calls per window that prefetch always leaves to interactive requests
+PREFETCH_RESERVE = int(os.getenv("PREFETCH_RESERVE", 5))
+
+
+class PrefetchSkipped(Exception):
+    """Raised by a prefetch task that decided not to spend upstream quota"""
+
+
+class Prefetcher:
+    """
+    Runs speculative background work grouped by a key (one group per code snippet).
+
+    Tasks only start while no interactive request is talking to the upstream API,
+    at most `concurrency` run at once, and tasks that have not started yet can be
+    cancelled per group. A started task runs to completion so its result is cached.
+    """
+
+    def __init__(self, enabled: bool = None, concurrency: int = None):
+        self.enabled = PREFETCH_ENABLED if enabled is None else enabled
+        self.concurrency = concurrency or PREFETCH_CONCURRENCY
+        self.groups = {}
+        self.stats = {'scheduled': 0, 'completed': 0, 'skipped': 0, 'failed': 0, 'cancelled': 0}
+        self._semaphore = None
+        self._idle = None
+        self._interactive = 0
+
+    def _ensure_primitives(self):
+        # Created lazily so they bind to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._idle = asyncio.Event()
+            self._idle.set()
+
+    @asynccontextmanager
+    async def interactive(self):
+        """Mark an interactive upstream call in flight; prefetch waits until none are left"""
+        self._ensure_primitives()
+        self._interactive += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._interactive -= 1
+            if self._interactive == 0:
+                self._idle.set()
+
+    def schedule(self, group: str, work: dict) -> int:
+        """
+        Queue `work` ({name: coroutine factory}) for `group`, skipping names already
+        pending for that group. Returns the number of newly scheduled tasks.
+        """
+        if not self.enabled:
+            return 0
+        self._ensure_primitives()
+
+        pending = self.groups.setdefault(group, {})
+        scheduled = 0
+        for name, factory in work.items():
+            if name in pending:
+                continue
+            entry = {'started': False}
+            entry['task'] = asyncio.create_task(self._run(group, name, factory, entry))
+            pending[name] = entry
+            scheduled += 1
+        self.stats['scheduled'] += scheduled
+        return scheduled
+
+    async def _run(self, group: str, name: str, factory, entry: dict):
+        try:
+            async with self._semaphore:
+                # Yield to interactive traffic before every upstream call
+                while not self._idle.is_set():
+                    await self._idle.wait()
+                entry['started'] = True
+                await factory()
+            self.stats['completed'] += 1
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+        except PrefetchSkipped:
+            self.stats['skipped'] += 1
+        except Exception:
+            self.stats['failed'] += 1
+        finally:
+            pending = self.groups.get(group, {})
+            pending.pop(name, None)
+            if not pending:
+                self.groups.pop(group, None)
+
+    def cancel(self, group: str) -> int:
+        """Cancel tasks of a group that have not reached the upstream API yet"""
+        cancelled = 0
+        for entry in list(self.groups.get(group, {}).values()):
+            if not entry['started']:
+                entry['task'].cancel()
+                cancelled += 1
+        return cancelled
+
+    async def stop(self):
+        """Cancel every outstanding task, started or not"""
+        tasks = [entry['task'] for pending in self.groups.values() for entry in pending.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
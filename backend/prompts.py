@@ -43,3 +43,51 @@ Please provide:
 5. Maintainability improvements
 
 Focus on making the code cleaner, more efficient, and easier to maintain."""
+
+# Section markers for the combined review; parse_review_response splits on them
+REVIEW_SECTIONS = {
+    'walkthrough': '=== WALKTHROUGH ===',
+    'debug': '=== BUG REVIEW ===',
+    'refactor': '=== REFACTOR ===',
+}
+
+def review_prompt(code: str, error: str = None) -> str:
+    prompt = f"""Please review the following code in three separate sections:
+
+{code}
+
+"""
+    if error:
+        prompt += f"Error message: {error}\n\n"
+
+    prompt += f"""Start each section with its marker line exactly as written, in this order, and write nothing before the first marker.
+
+{REVIEW_SECTIONS['walkthrough']}
+A line-by-line explanation: what each line does, the overall purpose, important concepts or patterns, and the flow of execution. Keep it beginner-friendly.
+
+{REVIEW_SECTIONS['debug']}
+Identify any bugs or issues, explain what causes them, provide a corrected version of the code and explain why the fix works.
+
+{REVIEW_SECTIONS['refactor']}
+An optimized version of the code, with the improvements, performance optimizations, better practices and maintainability gains explained."""
+
+    return prompt
+
+def parse_review_response(text: str) -> dict:
+    """Split a combined review into its sections; returns None unless every marker appears once, in order"""
+    positions = [text.find(marker) for marker in REVIEW_SECTIONS.values()]
+    if -1 in positions or positions != sorted(positions):
+        return None
+    if any(text.count(marker) != 1 for marker in REVIEW_SECTIONS.values()):
+        return None
+
+    sections = {}
+    names = list(REVIEW_SECTIONS)
+    for i, name in enumerate(names):
+        start = positions[i] + len(REVIEW_SECTIONS[name])
+        end = positions[i + 1] if i + 1 < len(names) else len(text)
+        content = text[start:end].strip()
+        if not content:
+            return None
+        sections[name] = content
+    return sections
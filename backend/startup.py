@@ -0,0 +1,73 @@
+import os
+import time
+
+
+def _process_start_time() -> float:
+    """Wall-clock time at which the OS started this process, or now where /proc is unavailable"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Split after the command name, which may contain spaces; starttime is field 22
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        started_after_boot = int(fields[19]) / os.sysconf('SC_CLK_TCK')
+        return time.time() - uptime + started_after_boot
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+# Includes interpreter startup and imports that ran before this module
+PROCESS_START = _process_start_time()
+
+# Preload heavy dependencies before the app reports ready
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+# Seconds since PROCESS_START at which each startup milestone was reached
+timings = {
+    'import_seconds': None,
+    'warmup_seconds': None,
+    'first_response_seconds': None
+}
+
+
+def mark(name: str):
+    """Record a startup milestone, keeping only the first occurrence"""
+    if timings.get(name) is None:
+        timings[name] = round(time.time() - PROCESS_START, 4)
+
+
+def warm_up(steps: dict) -> dict:
+    """
+    Run named warm-up callables and return how long each one took. A failing
+    step is recorded as None; the app then pays that cost on first use instead.
+    """
+    durations = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            durations[name] = None
+            continue
+        durations[name] = round(time.perf_counter() - started, 4)
+    mark('warmup_seconds')
+    return durations
+
+
+class FirstResponseTimer:
+    """ASGI middleware that records when the first HTTP response starts, then steps aside"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or timings['first_response_seconds'] is not None:
+            await self.app(scope, receive, send)
+            return
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                mark('first_response_seconds')
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
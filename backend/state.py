@@ -0,0 +1,331 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# Where shared cache and rate-limit state lives: "memory", "sqlite:///path/to.db"
+# or "redis://host:port/db". Anything but "memory" is shared between workers.
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+# Seconds between purges of expired entries, and the most keys the memory backend holds
+STATE_PURGE_INTERVAL = int(os.getenv("STATE_PURGE_INTERVAL", 300))
+MEMORY_STATE_MAX_KEYS = int(os.getenv("MEMORY_STATE_MAX_KEYS", 10000))
+
+
+class StateBackend:
+    """
+    Minimal key/value interface shared by the response cache and the rate limiter.
+    Values are strings; every key may carry a time-to-live in seconds.
+    """
+
+    def get(self, key: str):
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: int = None):
+        raise NotImplementedError
+
+    def incr(self, key: str, amount: int = 1, ttl: int = None) -> int:
+        """Atomically add to a counter; the TTL applies only when the key is created"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Remove expired entries and return how many; reads already ignore them"""
+        return 0
+
+
+class MemoryBackend(StateBackend):
+    """
+    Per-process backend; correct only when a single worker serves the app.
+    Holds at most `max_keys` entries, evicting the oldest once expired ones are gone.
+    """
+
+    def __init__(self, max_keys: int = None):
+        self.max_keys = max_keys or MEMORY_STATE_MAX_KEYS
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: int = None):
+        with self._lock:
+            self._store(key, value, time.time() + ttl if ttl else None)
+
+    def incr(self, key: str, amount: int = 1, ttl: int = None) -> int:
+        with self._lock:
+            entry = self._live(key)
+            if entry:
+                value, expires_at = int(entry[0]) + amount, entry[1]
+            else:
+                value, expires_at = amount, time.time() + ttl if ttl else None
+            self._store(key, str(value), expires_at)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge()
+
+    def _store(self, key: str, value: str, expires_at: float):
+        if key not in self._data and len(self._data) >= self.max_keys:
+            self._purge()
+            # Still full: drop the oldest entries (dicts keep insertion order)
+            while len(self._data) >= self.max_keys:
+                del self._data[next(iter(self._data))]
+        self._data[key] = (value, expires_at)
+
+    def _purge(self) -> int:
+        now = time.time()
+        expired = [key for key, (_, expires_at) in self._data.items()
+                   if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+
+class SQLiteBackend(StateBackend):
+    """
+    Backend stored in a SQLite file, shared by every worker process on one host.
+    WAL mode lets readers proceed while a writer holds the lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._connect().execute(
+            "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: int = None):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None)
+        )
+
+    def incr(self, key: str, amount: int = 1, ttl: int = None) -> int:
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so concurrent workers serialize
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM state WHERE key = ?", (key,)
+            ).fetchone()
+            if row and (row[1] is None or row[1] > now):
+                value, expires_at = int(row[0]) + amount, row[1]
+            else:
+                value, expires_at = amount, now + ttl if ttl else None
+            conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, str(value), expires_at)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return value
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        cursor = self._connect().execute(
+            "DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+
+class RedisBackend(StateBackend):
+    """
+    Backend speaking the Redis protocol (RESP) over a plain socket, so any
+    Redis-compatible server works without an extra client dependency.
+    The server expires keys itself, so purge_expired has nothing to do.
+    """
+
+    # Safe to send again when a failed attempt may or may not have been applied
+    IDEMPOTENT_COMMANDS = {"GET", "SET", "DEL", "EXPIRE"}
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0,
+                 password: str = None, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile('rb'))
+            try:
+                if self.password:
+                    self._send(conn, "AUTH", self.password)
+                if self.db:
+                    self._send(conn, "SELECT", self.db)
+            except BaseException:
+                self._close(conn)
+                raise
+            self._local.conn = conn
+        return conn
+
+    def _close(self, conn):
+        sock, reader = conn
+        reader.close()
+        sock.close()
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            self._close(conn)
+
+    def _encode(self, *args) -> bytes:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        return b"".join(parts)
+
+    def _send(self, conn, *args):
+        sock, reader = conn
+        sock.sendall(self._encode(*args))
+        return self._read_reply(reader)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RuntimeError(f"Redis error: {payload.decode()}")
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            count = int(payload)
+            if count == -1:
+                return None
+            return [self._read_reply(reader) for _ in range(count)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def command(self, *args):
+        """
+        Run one command. After a network error or timeout the connection is
+        closed, since a reply may still be pending on it, and only idempotent
+        commands are retried once: the server may already have applied the first
+        attempt, and an INCRBY sent twice would count twice.
+        """
+        retries = 1 if args[0] in self.IDEMPOTENT_COMMANDS else 0
+        while True:
+            try:
+                return self._send(self._connection(), *args)
+            except OSError:
+                # ConnectionError and socket timeouts are OSErrors too
+                self._drop_connection()
+                if not retries:
+                    raise
+                retries -= 1
+
+    def transaction(self, *commands) -> list:
+        """
+        Run commands (tuples of arguments) atomically in one MULTI/EXEC round trip
+        and return their replies. Never retried, since the outcome of a failed
+        attempt is unknown.
+        """
+        sock, reader = conn = self._connection()
+        try:
+            sock.sendall(b"".join(self._encode(*args) for args in (("MULTI",), *commands, ("EXEC",))))
+            # +OK for MULTI and +QUEUED per command, then the EXEC reply
+            for _ in range(len(commands) + 1):
+                self._read_reply(reader)
+            return self._read_reply(reader)
+        except BaseException:
+            # Replies may still be pending on the connection
+            self._drop_connection()
+            raise
+
+    def get(self, key: str):
+        return self.command("GET", key)
+
+    def set(self, key: str, value: str, ttl: int = None):
+        if ttl:
+            self.command("SET", key, value, "EX", int(ttl))
+        else:
+            self.command("SET", key, value)
+
+    def incr(self, key: str, amount: int = 1, ttl: int = None) -> int:
+        if not ttl:
+            return self.command("INCRBY", key, amount)
+        # Creating the key with its TTL and counting happen together, so a
+        # counter can never be left behind without an expiry
+        _, value = self.transaction(
+            ("SET", key, 0, "EX", int(ttl), "NX"),
+            ("INCRBY", key, amount),
+        )
+        return value
+
+    def delete(self, key: str):
+        self.command("DEL", key)
+
+
+def create_backend(url: str = None) -> StateBackend:
+    """Build a backend from a URL such as 'memory', 'sqlite:///tmp/state.db' or 'redis://localhost:6379/0'"""
+    url = url or STATE_BACKEND
+    if url == "memory":
+        return MemoryBackend()
+
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        # sqlite:///relative.db and sqlite:////absolute/path.db, as in SQLAlchemy
+        path = parsed.path[1:] if parsed.path.startswith("/") else parsed.path
+        if not path:
+            raise ValueError("STATE_BACKEND sqlite URL needs a file path")
+        return SQLiteBackend(path)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        return RedisBackend(parsed.hostname or "localhost", parsed.port or 6379, db, parsed.password)
+
+    raise ValueError(f"Unsupported STATE_BACKEND: {url}")
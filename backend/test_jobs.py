@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the asynchronous job API
+"""
+
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.jobs import JobManager, COMPLETED, QUEUED
+
+def _wait_for(client, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("completed", "failed"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+def test_compare_job_round_trip():
+    """Submit a compare job, poll it and fetch the result"""
+    with TestClient(app) as client:
+        response = client.post("/jobs", json={
+            "kind": "compare",
+            "original_code": "a = 1",
+            "modified_code": "a = 2"
+        })
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        assert _wait_for(client, job_id)["status"] == "completed"
+        result = client.get(f"/jobs/{job_id}/result").json()
+        assert result["comparison"]["summary"]
+
+def test_job_events_stream_until_finished():
+    """The SSE stream ends with the final status"""
+    with TestClient(app) as client:
+        job_id = client.post("/jobs", json={"kind": "analyze", "code": "def f():\n    pass"}).json()["job_id"]
+        body = client.get(f"/jobs/{job_id}/events").text
+        assert body.startswith("event: status")
+        assert '"status": "completed"' in body
+
+def test_unknown_job_is_404():
+    with TestClient(app) as client:
+        assert client.get("/jobs/missing").status_code == 404
+
+def test_job_path_accepts_inputs_too_large_for_interactive_endpoints():
+    """Large inputs get a 413 pointing at /jobs, and /jobs accepts them"""
+    code = "a = 1\n" * 6000
+    with TestClient(app) as client:
+        rejected = client.post("/analyze", json={"code": code})
+        assert rejected.status_code == 413
+        assert "/jobs" in rejected.json()["detail"]
+        assert client.post("/jobs", json={"kind": "analyze", "code": code}).status_code == 202
+
+def test_pending_jobs_survive_restart(tmp_path):
+    """Jobs persisted to disk are re-queued by a fresh manager and results expire after the TTL"""
+    async def scenario():
+        async def handler(payload):
+            return {"echo": payload["value"]}
+
+        first = JobManager(workers=1, jobs_dir=str(tmp_path))
+        first.register("echo", handler)
+        # Submitted but never started, like a worker that died before running it
+        job = first.submit("echo", {"value": 42})
+        assert job["status"] == QUEUED
+
+        second = JobManager(workers=1, result_ttl=0, jobs_dir=str(tmp_path))
+        second.register("echo", handler)
+        await second.start()
+        for _ in range(100):
+            if second.get(job["id"])["status"] == COMPLETED:
+                break
+            await asyncio.sleep(0.01)
+        await second.stop()
+
+        assert second.get(job["id"])["result"] == {"echo": 42}
+        assert second.sweep(now=time.time() + 1) == 1
+        assert not list(tmp_path.glob("*.json"))
+
+    asyncio.run(scenario())
+
+def test_live_owner_keeps_its_pending_jobs(tmp_path):
+    """A manager cannot claim a pending job whose owner is still heartbeating"""
+    async def scenario():
+        async def handler(payload):
+            await asyncio.sleep(10)
+
+        owner = JobManager(workers=1, jobs_dir=str(tmp_path))
+        owner.register("slow", handler)
+        await owner.start()
+        job = owner.submit("slow", {})
+
+        other = JobManager(workers=1, jobs_dir=str(tmp_path))
+        assert other._claim(job["id"]) is None
+        assert other.get(job["id"])["owner"] == owner.owner
+        assert not list(tmp_path.glob("*.claim"))
+
+        # Once the owner is gone, exactly one manager takes the job over
+        await owner.stop()
+        assert other._claim(job["id"])["owner"] == other.owner
+        other._heartbeat()
+        third = JobManager(workers=1, jobs_dir=str(tmp_path))
+        assert third._claim(job["id"]) is None
+
+    asyncio.run(scenario())
+
+def test_shared_jobs_dir_runs_a_pending_job_once(tmp_path):
+    """Two managers restoring the same orphaned job run it exactly once"""
+    async def scenario():
+        runs = []
+
+        async def handler(payload):
+            runs.append(payload["value"])
+            return {}
+
+        dead = JobManager(workers=1, jobs_dir=str(tmp_path))
+        dead.register("echo", handler)
+        job = dead.submit("echo", {"value": 1})
+
+        managers = [JobManager(workers=1, jobs_dir=str(tmp_path)) for _ in range(2)]
+        for manager in managers:
+            manager.register("echo", handler)
+        await asyncio.gather(*(manager.start() for manager in managers))
+        for _ in range(100):
+            if any(m.jobs.get(job["id"], {}).get("status") == COMPLETED for m in managers):
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        for manager in managers:
+            await manager.stop()
+
+        assert runs == [1]
+        assert sum(job["id"] in manager.jobs for manager in managers) == 1
+
+    asyncio.run(scenario())
+
+def test_wait_for_change_sees_transitions_before_the_wait(tmp_path):
+    """A change made before waiting returns at once, for local and other-process jobs"""
+    async def scenario():
+        async def handler(payload):
+            return {}
+
+        manager = JobManager(workers=1, jobs_dir=str(tmp_path))
+        manager.register("echo", handler)
+        job = manager.submit("echo", {})
+        since = job["updated_at"]
+        await manager.start()
+        await asyncio.sleep(0.05)
+
+        observer = JobManager(workers=1, jobs_dir=str(tmp_path))
+        for waiter in (manager, observer):
+            changed = await asyncio.wait_for(waiter.wait_for_change(job["id"], since, 10), 1)
+            assert changed["status"] == COMPLETED
+        await manager.stop()
+
+    asyncio.run(scenario())
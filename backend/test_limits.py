@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for request size and line limits
+"""
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from backend.main import app
+from backend.limits import BodyScanner, MAX_REQUEST_BYTES, MAX_CODE_LINES, MAX_LINE_LENGTH
+
+client = TestClient(app)
+
+def test_oversized_body_is_rejected():
+    """Bodies above the byte limit never reach the handler"""
+    response = client.post("/analyze", json={"code": "x" * (MAX_REQUEST_BYTES + 1)})
+    assert response.status_code == 413
+
+def test_too_many_lines_is_rejected():
+    """Line count is enforced with a 413 rather than a 422"""
+    response = client.post("/compare", json={
+        "original_code": "a = 1\n" * (MAX_CODE_LINES + 1),
+        "modified_code": "a = 2"
+    })
+    assert response.status_code == 413
+
+def test_long_line_is_rejected():
+    """Line length is enforced with a 413 rather than a 422"""
+    response = client.post("/analyze", json={"code": "x" * (MAX_LINE_LENGTH + 1)})
+    assert response.status_code == 413
+
+def test_valid_request_passes():
+    """Ordinary requests are unaffected by the limits"""
+    response = client.post("/analyze", json={"code": "def f():\n    return 1\n"})
+    assert response.status_code == 200
+    assert response.json()["analysis"]["function_count"] == 1
+
+def test_compare_still_requires_both_snippets():
+    """Typed compare requests keep the 400 for missing code"""
+    response = client.post("/compare", json={"original_code": "a = 1"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1024])
+def test_scanner_counts_newlines_across_chunks(chunk_size):
+    """Newline escapes split across chunks are counted once, escaped backslashes are not"""
+    body = json.dumps({"code": "a\nb\\nc\nd"}).encode()
+    scanner = BodyScanner(len(body), 10, 100)
+    for start in range(0, len(body), chunk_size):
+        assert scanner.feed(body[start:start + chunk_size]) is None
+    assert scanner.newlines == 2
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for speculative prefetch of LLM modes
+"""
+
+import asyncio
+import time
+from fastapi.testclient import TestClient
+import pytest
+import backend.main as main
+from backend.cache import RateLimiter
+from backend.prefetch import Prefetcher, PrefetchSkipped, PREFETCH_RESERVE
+from backend.state import MemoryBackend
+
+
+def test_follow_up_modes_come_from_cache(fake_upstream):
+    code = "def add(a, b):\n    return a + b"
+    with TestClient(main.app) as client:
+        assert client.post("/walkthrough", json={"code": code, "prefetch": True}).status_code == 200
+
+        deadline = time.time() + 5
+        while main.prefetcher.stats["completed"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(fake_upstream.prompts) == 3
+
+        assert client.post("/debug", json={"code": code}).status_code == 200
+        assert client.post("/refactor", json={"code": code}).status_code == 200
+        assert len(fake_upstream.prompts) == 3
+
+
+def test_prefetch_starts_only_after_the_interactive_call(fake_upstream):
+    code = "def sub(a, b):\n    return a - b"
+    with TestClient(main.app) as client:
+        assert client.post("/walkthrough", json={"code": code, "prefetch": True}).status_code == 200
+
+        deadline = time.time() + 5
+        while main.prefetcher.stats["completed"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+    walkthrough = main.walkthrough_prompt(code)
+    assert fake_upstream.events[:2] == [("start", walkthrough), ("end", walkthrough)]
+    assert len(fake_upstream.events) == 6
+
+
+def test_no_prefetch_without_opt_in(fake_upstream):
+    with TestClient(main.app) as client:
+        client.post("/walkthrough", json={"code": "x = 1"})
+        time.sleep(0.1)
+    assert len(fake_upstream.prompts) == 1
+    assert main.prefetcher.stats["scheduled"] == 0
+
+
+def test_prefetch_waits_for_interactive_and_can_be_cancelled():
+    async def scenario():
+        prefetcher = Prefetcher(enabled=True, concurrency=1)
+        ran = []
+
+        async def work():
+            ran.append(True)
+
+        async with prefetcher.interactive():
+            prefetcher.schedule("snippet", {"debug": work, "refactor": work})
+            await asyncio.sleep(0.05)
+            assert ran == []
+            assert prefetcher.cancel("snippet") == 2
+
+        await asyncio.sleep(0.05)
+        assert ran == []
+        assert prefetcher.stats["cancelled"] == 2
+        assert prefetcher.groups == {}
+
+    asyncio.run(scenario())
+
+
+def test_refused_prefetch_spends_no_budget(fake_upstream, monkeypatch):
+    """A prefetch refused for lack of global headroom leaves both counters untouched"""
+    backend = MemoryBackend()
+    llm = RateLimiter(backend, limit=PREFETCH_RESERVE, window=60)
+    budget = RateLimiter(backend, limit=1, window=60)
+    monkeypatch.setattr(main, "llm_rate_limiter", llm)
+    monkeypatch.setattr(main, "prefetch_limiter", budget)
+
+    with pytest.raises(PrefetchSkipped):
+        asyncio.run(main.ask_deepseek("prompt", background=True))
+    assert fake_upstream.prompts == []
+    assert budget.allow("prefetch")
+    for _ in range(PREFETCH_RESERVE):
+        assert llm.allow("llm")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for the combined /review endpoint
+"""
+
+from fastapi.testclient import TestClient
+import backend.main as main
+from backend.prompts import REVIEW_SECTIONS, parse_review_response
+
+COMBINED_ANSWER = f"""{REVIEW_SECTIONS['walkthrough']}
+Line 1 defines a function.
+{REVIEW_SECTIONS['debug']}
+No bugs found.
+{REVIEW_SECTIONS['refactor']}
+Already minimal."""
+
+def test_review_uses_one_upstream_call(fake_upstream):
+    fake_upstream.responses.append(COMBINED_ANSWER)
+    with TestClient(main.app) as client:
+        response = client.post("/review", json={"code": "def f():\n    pass"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "walkthrough": "Line 1 defines a function.",
+        "debug": "No bugs found.",
+        "refactor": "Already minimal.",
+        "combined": True
+    }
+    assert len(fake_upstream.prompts) == 1
+    assert fake_upstream.prompts[0].count("def f():") == 1
+
+def test_review_falls_back_to_separate_calls(fake_upstream):
+    fake_upstream.responses.extend(["no markers here", "walk", "bugs", "refactored"])
+    with TestClient(main.app) as client:
+        body = client.post("/review", json={"code": "x = 1"}).json()
+
+    assert body["combined"] is False
+    assert len(fake_upstream.prompts) == 4
+    assert {body["walkthrough"], body["debug"], body["refactor"]} == {"walk", "bugs", "refactored"}
+
+def test_parse_rejects_out_of_order_sections():
+    text = f"{REVIEW_SECTIONS['debug']}\na\n{REVIEW_SECTIONS['walkthrough']}\nb\n{REVIEW_SECTIONS['refactor']}\nc"
+    assert parse_review_response(text) is None
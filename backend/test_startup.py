@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for lazy imports and startup timing
+"""
+
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from backend import startup
+from backend.main import app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_heavy_dependencies_are_not_imported_at_startup():
+    """Importing the app leaves openai and deepdiff for the endpoints that need them"""
+    script = "import sys, backend.main; print(sorted(m for m in ('openai', 'deepdiff') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+def test_warm_up_preloads_analysis():
+    script = (
+        "import sys\n"
+        "from fastapi.testclient import TestClient\n"
+        "import backend.main as main\n"
+        "with TestClient(main.app) as client:\n"
+        "    print('deepdiff' in sys.modules, client.get('/ready').json()['warmed_up'])\n"
+    )
+    env = dict(os.environ, WARMUP_ON_STARTUP="true")
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "True True"
+
+def test_startup_timings_count_from_process_start():
+    """Time spent before the app is imported is included in the timings"""
+    script = "import time; time.sleep(0.3); import backend.main as main; print(main.startup.timings['import_seconds'])"
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert float(output.stdout) >= 0.3
+
+def test_failed_warm_up_step_does_not_stop_startup():
+    def unreachable():
+        raise ConnectionError("offline")
+
+    durations = startup.warm_up({"llm_client": unreachable, "noop": lambda: None})
+    assert durations["llm_client"] is None
+    assert durations["noop"] is not None
+
+def test_stats_report_startup_timings():
+    with TestClient(app) as client:
+        client.get("/")
+        timings = client.get("/stats").json()["startup"]
+    assert timings["import_seconds"] > 0
+    assert timings["first_response_seconds"] >= timings["import_seconds"]
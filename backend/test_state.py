@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared state backends, response cache and rate limiter
+"""
+
+import socketserver
+import threading
+import time
+from multiprocessing import Process
+import pytest
+from backend.state import MemoryBackend, SQLiteBackend, create_backend
+from backend.cache import ResponseCache, RateLimiter, cache_key
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    """Local stand-in for a Redis server supporting the commands the backend uses"""
+
+    def _read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        queued = None
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            if command == "MULTI":
+                queued, reply = [], b"+OK\r\n"
+            elif command == "EXEC":
+                replies = [self._execute(queued_args) for queued_args in queued]
+                queued, reply = None, f"*{len(replies)}\r\n".encode() + b"".join(replies)
+            elif queued is not None:
+                queued.append(args)
+                reply = b"+QUEUED\r\n"
+            else:
+                reply = self._execute(args)
+            if self.server.drop_replies:
+                # Apply the command but hang up before answering
+                self.server.drop_replies -= 1
+                return
+            self.wfile.write(reply)
+
+    def _execute(self, args):
+        data, expiry = self.server.data, self.server.expiry
+        command, key = args[0].upper(), args[1] if len(args) > 1 else None
+        if key in expiry and expiry[key] <= time.time():
+            data.pop(key, None)
+            expiry.pop(key, None)
+
+        if command == "GET":
+            value = data.get(key)
+            reply = b"$-1\r\n" if value is None else f"${len(value)}\r\n{value}\r\n".encode()
+        elif command == "SET":
+            options = [arg.upper() for arg in args[3:]]
+            if "NX" in options and key in data:
+                return b"$-1\r\n"
+            data[key] = args[2]
+            expiry.pop(key, None)
+            if "EX" in options:
+                expiry[key] = time.time() + int(args[3 + options.index("EX") + 1])
+            reply = b"+OK\r\n"
+        elif command == "INCRBY":
+            data[key] = str(int(data.get(key, 0)) + int(args[2]))
+            reply = f":{data[key]}\r\n".encode()
+        elif command == "EXPIRE":
+            expiry[key] = time.time() + int(args[2])
+            reply = b":1\r\n"
+        elif command == "DEL":
+            reply = f":{int(data.pop(key, None) is not None)}\r\n".encode()
+        else:
+            reply = f"-ERR unknown command {command}\r\n".encode()
+        return reply
+
+
+@pytest.fixture
+def fake_redis():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.data, server.expiry = {}, {}
+    server.drop_replies = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "state.db"))
+    server = request.getfixturevalue("fake_redis")
+    return create_backend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+
+
+def test_get_set_delete(backend):
+    assert backend.get("missing") is None
+    backend.set("key", "value")
+    assert backend.get("key") == "value"
+    backend.delete("key")
+    assert backend.get("key") is None
+
+
+def test_ttl_expires(backend):
+    backend.set("short", "value", ttl=1)
+    assert backend.get("short") == "value"
+    time.sleep(1.1)
+    assert backend.get("short") is None
+
+
+def test_incr_counts(backend):
+    assert backend.incr("counter", 1, ttl=60) == 1
+    assert backend.incr("counter", 2, ttl=60) == 3
+
+
+def test_purge_drops_expired_keys_never_read_again(backend):
+    backend.set("short", "value", ttl=1)
+    backend.incr("rate:llm:1", 1, ttl=1)
+    backend.set("kept", "value", ttl=60)
+    time.sleep(1.1)
+    # Redis expires keys on its own, so there is nothing left for it to purge
+    expected = 0 if backend.__class__.__name__ == "RedisBackend" else 2
+    assert backend.purge_expired() == expected
+    assert backend.purge_expired() == 0
+    assert backend.get("kept") == "value"
+
+
+def test_memory_backend_caps_its_size():
+    backend = MemoryBackend(max_keys=2)
+    backend.set("expired", "value", ttl=1)
+    backend.set("oldest", "value")
+    time.sleep(1.1)
+    backend.set("new", "value")
+    assert backend.get("oldest") == "value"
+    backend.set("newest", "value")
+    assert backend.get("oldest") is None
+    assert backend.get("new") == backend.get("newest") == "value"
+
+
+def test_redis_retries_only_idempotent_commands(fake_redis):
+    backend = create_backend(f"redis://127.0.0.1:{fake_redis.server_address[1]}/0")
+    fake_redis.drop_replies = 1
+    with pytest.raises(ConnectionError):
+        backend.incr("counter")
+    assert fake_redis.data["counter"] == "1"
+
+    fake_redis.drop_replies = 1
+    backend.set("key", "value")
+    assert backend.get("key") == "value"
+    assert backend.incr("counter") == 2
+
+
+def test_redis_counter_is_created_with_its_ttl(fake_redis):
+    backend = create_backend(f"redis://127.0.0.1:{fake_redis.server_address[1]}/0")
+    assert backend.incr("rate:llm:1", 1, ttl=60) == 1
+    expires_at = fake_redis.expiry["rate:llm:1"]
+    assert backend.incr("rate:llm:1", 2, ttl=60) == 3
+    assert fake_redis.expiry["rate:llm:1"] == expires_at
+
+
+def test_cache_round_trip_and_hit_ratio(backend):
+    cache = ResponseCache(backend, ttl=60)
+    key = cache_key("analyze", "def f(): pass")
+    assert cache.get(key) is None
+    cache.set(key, {"function_count": 1})
+    assert cache.get(key) == {"function_count": 1}
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_rate_limiter_window(backend):
+    limiter = RateLimiter(backend, limit=2, window=60)
+    now = 1_000_000.0
+    assert limiter.allow("llm", now)
+    assert limiter.allow("llm", now)
+    assert not limiter.allow("llm", now)
+    assert limiter.allow("llm", now + 60)
+
+
+def test_rate_limiter_refund_frees_a_call(backend):
+    limiter = RateLimiter(backend, limit=1, window=60)
+    now = 1_000_000.0
+    assert limiter.allow("llm", now)
+    limiter.refund("llm", now)
+    assert limiter.allow("llm", now)
+
+
+def test_cache_key_separates_parts():
+    assert cache_key("compare", "ab", "c") != cache_key("compare", "a", "bc")
+
+
+def _increment_many(path, count):
+    backend = SQLiteBackend(path)
+    for _ in range(count):
+        backend.incr("shared", 1, ttl=60)
+
+
+def test_sqlite_counter_is_exact_across_processes(tmp_path):
+    """Several worker processes on one host share one quota counter"""
+    path = str(tmp_path / "state.db")
+    SQLiteBackend(path)
+    workers = [Process(target=_increment_many, args=(path, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert SQLiteBackend(path).get("shared") == "200"
+
+
+def test_create_backend_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        create_backend("memcached://localhost")
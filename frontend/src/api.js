@@ -9,7 +9,8 @@ export const sendCode = async (mode, code, error = '') => {
     refactor: '/refactor',
   }[mode];
 
-  const payload = { code };
+  // Let the backend precompute the other modes, if prefetch is enabled server-side
+  const payload = { code, prefetch: true };
   if (mode === 'debug') {
     payload.error = error;
   }